@@ -0,0 +1,35 @@
+# cython: language_level=3
+# distutils: extra_compile_args = -O3 -ffast-math -march=native
+# distutils: libraries = m
+"""Compiled coupon bond pricer for teaching_notes_1
+
+teaching_notes_1 uses this module in place of its numba kernel when it has
+been built, e.g. with ``cythonize -i prything/_coupon_bond_price.pyx``.
+"""
+cimport cython
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def coupon_bond_price(
+    const double[:, ::1] r,
+    long long t,
+    const long long[::1] T,
+    double c,
+    long long freq,
+    double principal,
+):
+    """The price of a coupon bond at time t, see teaching_notes_1"""
+    cdef Py_ssize_t i
+    cdef Py_ssize_t n = T.shape[0]
+    cdef long long Ti
+    cdef double pv = 0.0
+
+    for i in range(1, n):
+        Ti = T[i]
+        pv += (c / freq) * (1.0 + r[t, Ti] / freq) ** (-freq * (Ti - t))
+
+    Ti = T[n - 1]
+    pv += principal * (1.0 + r[t, Ti] / freq) ** (-freq * (Ti - t))
+    return pv
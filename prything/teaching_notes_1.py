@@ -1,5 +1,58 @@
+import math
+from dataclasses import dataclass
+
 import numpy as np
 
+# Every array is cast to float64 once on the way in, so the ufuncs never have
+# to promote mixed int/float inputs on each call
+_F64 = np.float64
+
+try:
+    from numba import get_num_threads, njit, prange, set_num_threads
+
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """Stand-in for numba.njit that leaves the function uncompiled"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+try:
+    from prything._coupon_bond_price import (
+        coupon_bond_price as _coupon_bond_price_ext,
+    )
+
+    HAVE_EXTENSION = True
+except ImportError:
+    HAVE_EXTENSION = False
+
+try:
+    import numexpr
+
+    HAVE_NUMEXPR = True
+except ImportError:
+    HAVE_NUMEXPR = False
+
+# Above this many elements compound and discount hand the work to numexpr,
+# which evaluates the whole expression in one threaded pass without the
+# temporary arrays NumPy creates for each operation. On a single thread
+# numexpr measured slower than NumPy at every size (1.2ms against 1.1ms at
+# 1e5 elements, 11ms against 5ms at 1e6), so it only pays off with threads
+_NUMEXPR_MIN_SIZE = 100_000
+
+
+def _use_numexpr(r, T):
+    """Whether r and T are large enough to be worth evaluating with numexpr"""
+    return (
+        HAVE_NUMEXPR
+        and max(np.size(r), np.size(T)) > _NUMEXPR_MIN_SIZE
+        and numexpr.get_num_threads() > 1
+    )
+
 
 def compound(r: float, n: int, T: int, n_infinity=True) -> float:
     """Calculate investment returns "added" into principal as time goes on
@@ -21,11 +74,11 @@ def compound(r: float, n: int, T: int, n_infinity=True) -> float:
 
     Parameters
     ----------
-    r : float
+    r : float or ndarray
         the interest rate being invested at (e.g., 0.038 = 3.8%)
     n : int
         the compounding frequency (e.g., n payments per year)
-    T : int
+    T : int or ndarray
         the periods (e.g., T years) of the investment
     n_infinity : logical
         whether n approaches infinity, defaults to true because we use
@@ -33,9 +86,22 @@ def compound(r: float, n: int, T: int, n_infinity=True) -> float:
 
     Returns
     -------
-    float
+    float or ndarray
         The value of $1 at the end of compounding
     """
+    if isinstance(r, float) and isinstance(T, (int, float)):
+        # Plain numbers go through math, which skips the ufunc dispatch that
+        # np.exp pays on every call. math raises where NumPy returns inf or
+        # nan (an overflow, or r/n below -1), so those fall through to NumPy
+        try:
+            if n_infinity:
+                return math.exp(r * T)
+            return math.exp(n * T * math.log1p(r / n))
+        except (OverflowError, ValueError):
+            pass
+
+    r = np.asarray(r, dtype=_F64)
+    T = np.asarray(T, dtype=_F64)
 
     if n_infinity:
         # $e^{r \cdot T}$
@@ -48,8 +114,15 @@ def compound(r: float, n: int, T: int, n_infinity=True) -> float:
         # Think about it this way: (1 + r/n) gives you the amount that you get
         # for each payment. And you get n payments over T periods. So to get
         # the final answer you take the multiplication of all of them to the
-        # power of n times T
-        ret = np.power(1 + r / n, n * T)
+        # power of n times T. Written as exp(n*T*log(1 + r/n)) so that log1p
+        # keeps its precision when r/n is small
+        if _use_numexpr(r, T):
+            ret = numexpr.evaluate(
+                "exp(n * T * log1p(r / n))",
+                local_dict={"n": n, "T": T, "r": r},
+            )
+        else:
+            ret = np.exp(n * T * np.log1p(r / n))
     return ret
 
 
@@ -64,18 +137,34 @@ def discount(r, n, T, n_infinity=True):
     as n approaches infinity.
 
     Args:
-        r (int): the interest rate
+        r (int or ndarray): the interest rate
         n (int): the compounding frequency
-        T (int): the horizon
+        T (int or ndarray): the horizon
         n_infinity (logical): if n approaches infinity
 
     Returns:
         int: The discount rate
     """
+    if isinstance(r, float) and isinstance(T, (int, float)):
+        # As in compound, with NumPy's inf or nan where math would raise
+        try:
+            if n_infinity:
+                return math.exp(-r * T)
+            return math.exp(-n * T * math.log1p(r / n))
+        except (OverflowError, ValueError):
+            pass
+
+    r = np.asarray(r, dtype=_F64)
+    T = np.asarray(T, dtype=_F64)
+
     if n_infinity:
         res = np.exp(-r * T)
+    elif _use_numexpr(r, T):
+        res = numexpr.evaluate(
+            "exp(-n * T * log1p(r / n))", local_dict={"n": n, "T": T, "r": r}
+        )
     else:
-        res = 1 / ((1 + r / n) ** (n * T))
+        res = np.exp(-n * T * np.log1p(r / n))
 
     return res
 
@@ -89,21 +178,81 @@ def rate_from_discount(n, Z_T, T, n_infinity=True):
 
     Args:
         n (int): the compounding frequency
-        Z_T (int): The discount rate
-        T (_type_): The horizon
+        Z_T (int or ndarray): The discount rate
+        T (int or ndarray): The horizon
         n_infinity (logical): if n approaches infinity
 
     Returns:
         int: Interest rate derviced from values
     """
+    Z_T = np.asarray(Z_T, dtype=_F64)
+    T = np.asarray(T, dtype=_F64)
+
     if n_infinity:
         res = (-1 / T) * np.log(Z_T)
     else:
-        res = n * (1 / (Z_T ** (1 / (n * T))) - 1)
+        # n * (Z_T^(-1/(n*T)) - 1), using expm1 to keep precision when Z_T is
+        # close to 1 (i.e., short maturities)
+        res = n * np.expm1(-np.log(Z_T) / (n * T))
     return res
 
 
-def discount_factor(r, t, T):
+# log2(e), turns exp(x) into 2^(x * log2(e))
+_LOG2_E = 1.4426950408889634
+
+
+@njit(cache=True, fastmath=True)
+def _fast_discount_factor(row, t, T, out):
+    """Approximate exp(row[T] * (t - T)) into out, without temporaries
+
+    exp is computed by writing the exponent bits of a float64 directly. With
+    y = x * log2(e), a polynomial in the fractional part of y supplies the
+    mantissa and the integer part is added straight into the exponent field.
+    The relative error is about 1e-4. T and out are 1-D.
+    """
+    bits = out.view(np.int64)
+    for i in range(T.shape[0]):
+        x = row[T[i]] * (t - T[i])
+
+        # Keep the result a normal float64 so the exponent arithmetic is valid
+        y = min(max(x, -708.0), 709.0) * _LOG2_E
+        yi = np.floor(y)
+        yf = y - yi
+
+        # 2^yf for yf in [0, 1), the Taylor series of exp(yf * ln 2)
+        out[i] = 1.0 + yf * (
+            0.6931471805599453
+            + yf
+            * (
+                0.2402265069591007
+                + yf
+                * (
+                    0.05550410866482158
+                    + yf * (0.009618129107628477 + yf * 0.0013333558146428443)
+                )
+            )
+        )
+        bits[i] += np.int64(yi) << 52
+
+
+def prepare_rates(r):
+    """Lay out a yield array for repeated pricing
+
+    The pricing functions read r[t, T] for one date t and many maturities T.
+    Storing r as a C-ordered float64 array makes each date a contiguous row,
+    so those reads are unit stride. Call this once, outside of any pricing
+    loop, and pass the result to the pricing functions.
+
+    Args:
+        r (ndarray): array of yields indexed as r[t, T]
+
+    Returns:
+        ndarray: r as a C-contiguous float64 array
+    """
+    return np.ascontiguousarray(r, dtype=_F64)
+
+
+def discount_factor(r, t, T, fast=False, out=None):
     """Find the discount rate for different maturities.
 
     When we discount future cash flows, the discount factor at t for a dollar
@@ -112,16 +261,113 @@ def discount_factor(r, t, T):
 
     Args:
         r (ndarray): array of continuously compounded yield at t for an
-        investment up to T
+        investment up to T, ideally laid out by prepare_rates
         t (int): the calendar date when the discounting is made
         T (int): the maturity date
+        fast (logical): use an approximate exp (about 1e-4 relative error)
+        compiled with numba, defaults to false. It measured 1.1-1.4x faster
+        up to about 1000 maturities and no faster beyond that. Without numba,
+        or with a non-contiguous out, np.exp is used anyway
+        out (ndarray): float64 array shaped like T to write the result into,
+        so that a pricing loop can reuse one buffer instead of allocating
 
     Returns:
         int: The discount factor at time t for (T - t) periods
     """
 
-    ret = np.exp(-r[t, T] * (T - t))
-    return ret
+    # r[t] is a view of the curve at t (cast only if it is not float64 yet)
+    row = np.asarray(r[t], dtype=_F64)
+    T = np.asarray(T)
+
+    # Neither the fast kernel nor np.take in "clip" mode checks T (np.take only
+    # writes straight into out when it does not have to raise on a bad
+    # index), so check the range here
+    if T.size and (T.min() < 0 or T.max() >= row.shape[0]):
+        raise IndexError("T is outside the maturities of r")
+
+    if fast and HAVE_NUMBA and (out is None or out.flags.c_contiguous):
+        # The kernel gathers, scales and exponentiates in one pass over out.
+        # ret[()] turns the 0-d result of a scalar T into a float64
+        ret = np.empty(T.shape) if out is None else out
+        _fast_discount_factor(row, t, np.ravel(T), ret.reshape(-1))
+        return ret if out is not None else ret[()]
+
+    x = np.take(row, T, out=out, mode="clip")
+    if isinstance(x, np.ndarray):
+        # From here on work in place, in out or in the array np.take made
+        np.multiply(x, t - T, out=x)
+    else:
+        x = x * (t - T)
+
+    return np.exp(x, out=x if isinstance(x, np.ndarray) else None)
+
+
+def _check_maturities(r, t, T):
+    """Raise a ValueError unless the bond with maturities T can be priced
+
+    Payments fall on T[1:], with the principal repaid at T[-1], so T needs at
+    least two dates, must end after t, and t and every T must index into r.
+
+    Returns:
+        ndarray: T as an array
+    """
+    T = np.asarray(T)
+    n_dates, n_maturities = np.shape(r)
+    if T.size < 2 or T[-1] <= t:
+        raise ValueError("T needs payment dates after T[0], ending after t")
+    if not np.issubdtype(T.dtype, np.integer):
+        raise ValueError("T needs integer maturities that index into r")
+    if not 0 <= t < n_dates:
+        raise ValueError("t is outside the dates of r")
+    if T.min() < 0 or T.max() >= n_maturities:
+        raise ValueError("T is outside the maturities of r")
+    return T
+
+
+@njit(cache=True, fastmath=True)
+def _bond_pv(r, t, T, start, stop, c, freq, principal):
+    """Present value of the bond whose maturities are T[start:stop]
+
+    The discounting is written out by hand so that numba keeps the running
+    present value in a register instead of calling discount for every coupon.
+    """
+    pv = 0.0
+    for i in range(start + 1, stop):
+        Ti = T[i]
+        pv += (c / freq) * (1.0 + r[t, Ti] / freq) ** (-freq * (Ti - t))
+
+    Tn = T[stop - 1]
+    pv += principal * (1.0 + r[t, Tn] / freq) ** (-freq * (Tn - t))
+    return pv
+
+
+# The compiled kernel coupon_bond_price hands off to, preferring the Cython
+# extension when it has been built. The numba kernel is compiled eagerly, so
+# it is only defined when it will be used
+if HAVE_EXTENSION:
+    _coupon_bond_price_compiled = _coupon_bond_price_ext
+elif HAVE_NUMBA:
+
+    @njit("f8(f8[:,::1], i8, i8[::1], f8, i8, f8)", cache=True, fastmath=True)
+    def _coupon_bond_price_jit(r, t, T, c, freq, principal):
+        """Compiled kernel behind coupon_bond_price"""
+        return _bond_pv(r, t, T, 0, T.shape[0], c, freq, principal)
+
+    _coupon_bond_price_compiled = _coupon_bond_price_jit
+else:
+    _coupon_bond_price_compiled = None
+
+
+@njit(parallel=True, cache=True, fastmath=True)
+def _coupon_bond_prices_jit(r, t, T_flat, T_offsets, c, freq, principal):
+    """Compiled kernel behind coupon_bond_prices, one bond per thread"""
+    n_bonds = T_offsets.shape[0] - 1
+    prices = np.empty(n_bonds)
+    for b in prange(n_bonds):
+        prices[b] = _bond_pv(
+            r, t, T_flat, T_offsets[b], T_offsets[b + 1], c[b], freq, principal
+        )
+    return prices
 
 
 def coupon_bond_price(r, t, T, c, freq=2, principal=100):
@@ -133,7 +379,8 @@ def coupon_bond_price(r, t, T, c, freq=2, principal=100):
         array of continuously compounded yield at time for an
         investment up to time T
     T : ndarray
-        array of the maturities
+        array of the maturities, the coupons are paid on T[1:] and the
+        principal on T[-1]
     c : int
         The coupon amount of the bond semi-annually
     freq : int
@@ -142,27 +389,196 @@ def coupon_bond_price(r, t, T, c, freq=2, principal=100):
         The principal amount of the bond, by default 100
     """
 
-    # Find the number of maturities
-    n = len(T)
-
-    # Calculate the value of each coupon payment
-    coupon_pmt = 0
-    for i in range(1, n):
-        coupon_pmt += (c / freq) / discount(
-            r[t, T[i]], freq, T[i] - t, n_infinity=False
+    # Neither the numba kernel nor the Cython extension checks its indices
+    # (an out-of-range T reads past the array), so check them here
+    T = _check_maturities(r, t, T)
+
+    if _coupon_bond_price_compiled is not None:
+        return _coupon_bond_price_compiled(
+            np.ascontiguousarray(r, dtype=_F64),
+            int(t),
+            np.ascontiguousarray(T, dtype=np.int64),
+            float(c),
+            int(freq),
+            float(principal),
         )
 
-    # Calculate the value of the principal payment
-    principal_pmt = principal / discount(
-        r[t, T[n]], freq, T[n] - t, n_infinity=False
-    )
+    # Gather the yields and times to maturity of every payment date at once.
+    # r[t] is a view of the curve at t, so the gather is the only copy
+    idx = T[1:]
+    dt = idx - t
+    row = np.asarray(r[t], dtype=_F64)
+    rv = np.take(row, idx)
+
+    # Discount all the coupon payments in a single ufunc call
+    df = np.power(1.0 + rv / freq, -freq * dt)
+    coupon_pmt = (c / freq) * df.sum()
+
+    # Calculate the value of the principal payment (paid at the last maturity)
+    principal_pmt = principal * df[-1]
 
     # Return the price
     return coupon_pmt + principal_pmt
 
 
+def _coupon_bond_prices_numpy(r, t, T_list, c_vec, freq, principal):
+    """NumPy version of coupon_bond_prices with one exp for every cash flow
+
+    The log discount factors of every payment of every bond are stacked into
+    one array so that np.exp runs once over contiguous memory, then
+    np.add.reduceat sums the weighted result bond by bond. Every T in T_list
+    must already have passed _check_maturities, which coupon_bond_prices
+    does, so each bond owns at least one payment.
+    """
+    idx = [T[1:] for T in T_list]
+    counts = np.array([len(i) for i in idx])
+    offsets = np.zeros(len(idx), dtype=np.int64)
+    np.cumsum(counts[:-1], out=offsets[1:])
+    idx = np.concatenate(idx)
+
+    # exp(-freq * dt * log(1 + r/freq)) is (1 + r/freq) ** (-freq * dt)
+    rv = np.asarray(r[t], dtype=_F64)[idx]
+    exponents = -freq * (idx - t) * np.log1p(rv / freq)
+
+    # Every payment is a coupon, and the last one of a bond adds the principal
+    weights = np.repeat(np.asarray(c_vec, dtype=_F64) / freq, counts)
+    weights[offsets + counts - 1] += principal
+
+    return np.add.reduceat(np.exp(exponents) * weights, offsets)
+
+
+def coupon_bond_prices(
+    r, t, T_list, c_vec, freq=2, principal=100, n_threads=None
+):
+    """The prices of a batch of coupon bonds at time t
+
+    Each bond is priced exactly as in coupon_bond_price. With numba the bonds
+    are spread over threads, and their maturities are packed into one flat
+    array plus offsets so that no Python objects are touched while pricing.
+    Without it, the discount factors of all the bonds come from a single
+    np.exp call.
+
+    Parameters
+    ----------
+    r : ndarray
+        array of continuously compounded yield at time for an
+        investment up to time T
+    T_list : list of ndarray
+        the array of maturities of each bond
+    c_vec : ndarray
+        The coupon amount of each bond
+    freq : int
+        The coupon payment frequency, by default 2
+    principal : int, optional
+        The principal amount of the bonds, by default 100
+    n_threads : int, optional
+        The number of threads numba prices with, by default all of them
+
+    Returns
+    -------
+    ndarray
+        The price of each bond
+    """
+
+    # Check every bond as coupon_bond_price would, the kernels do not
+    T_list = [_check_maturities(r, t, T) for T in T_list]
+    if np.size(c_vec) != len(T_list):
+        raise ValueError("c_vec needs one coupon per bond in T_list")
+    if not T_list:
+        # np.concatenate cannot pack an empty batch
+        return np.empty(0)
+
+    if not HAVE_NUMBA:
+        return _coupon_bond_prices_numpy(r, t, T_list, c_vec, freq, principal)
+
+    # Pack the ragged maturities into one array, the maturities of bond b
+    # are T_flat[T_offsets[b]:T_offsets[b + 1]]
+    T_offsets = np.zeros(len(T_list) + 1, dtype=np.int64)
+    np.cumsum([len(T) for T in T_list], out=T_offsets[1:])
+    T_flat = np.ascontiguousarray(np.concatenate(T_list), dtype=np.int64)
+
+    args = (
+        np.ascontiguousarray(r, dtype=_F64),
+        int(t),
+        T_flat,
+        T_offsets,
+        np.ascontiguousarray(c_vec, dtype=_F64),
+        int(freq),
+        float(principal),
+    )
+    if n_threads is None:
+        return _coupon_bond_prices_jit(*args)
+
+    # numba's thread count is global, so put it back once the batch is priced
+    previous = get_num_threads()
+    set_num_threads(n_threads)
+    try:
+        return _coupon_bond_prices_jit(*args)
+    finally:
+        set_num_threads(previous)
+
+
+@dataclass
+class PricingContext:
+    """Discounting tables for revaluing one bond on many dates
+
+    Column j holds the bases (1 + r/freq) and exponents -freq * (T_i - t) of
+    every payment date T_i = T[1:] on the date t = ts[j]. They are computed
+    once, so each revaluation is a single power over a contiguous column.
+    Build one with PricingContext.from_rates.
+    """
+
+    bases: np.ndarray
+    exponents: np.ndarray
+    freq: int = 2
+
+    @classmethod
+    def from_rates(cls, r, ts, T, freq=2):
+        """Build the tables for the maturities T on the dates ts
+
+        Args:
+            r (ndarray): array of yields indexed as r[t, T]
+            ts (ndarray): the calendar dates to price on
+            T (ndarray): array of the maturities
+            freq (int): the coupon payment frequency, by default 2
+
+        Returns:
+            PricingContext: tables of shape (len(T) - 1, len(ts))
+        """
+        ts = np.asarray(ts)
+        idx = np.asarray(T)[1:]
+
+        # Fortran order so that the column of each date is contiguous
+        bases = np.asfortranarray(1.0 + r[np.ix_(ts, idx)].T / freq)
+        exponents = np.asfortranarray(
+            -freq * np.subtract.outer(idx, ts), dtype=_F64
+        )
+        return cls(bases, exponents, freq)
+
+
+def coupon_bond_price_cached(ctx, t_idx, c, principal=100):
+    """The price of a coupon bond on the date ts[t_idx] of a PricingContext
+
+    Gives the same price as coupon_bond_price, without recomputing the
+    discounting bases and exponents.
+
+    Parameters
+    ----------
+    ctx : PricingContext
+        the tables built for the bond's maturities
+    t_idx : int
+        the position of the pricing date in the ts used to build ctx
+    c : int
+        The coupon amount of the bond
+    principal : int, optional
+        The principal amount of the bond, by default 100
+    """
+    df = np.power(ctx.bases[:, t_idx], ctx.exponents[:, t_idx])
+    return (c / ctx.freq) * df.sum() + principal * df[-1]
+
+
 if __name__ == "__main__":
-    r = np.array([[1, 2, 3, 4, 5], [1, 2, 3, 4, 5]])
+    r = np.array([[1, 2, 3, 4, 5, 6], [1, 2, 3, 4, 5, 6]]) / 100
     T = np.array([1, 2, 3, 4, 5])
-    coupon_bond_price(r, 1, T, 0.03)
+    print(coupon_bond_price(r, 1, T, 0.03))
 
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The repository is not packaged, so make prything importable from a checkout
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
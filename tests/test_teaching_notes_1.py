@@ -0,0 +1,276 @@
+import numpy as np
+import pytest
+
+from prything import teaching_notes_1 as tn
+
+
+def reference_price(r, t, T, c, freq=2, principal=100):
+    """coupon_bond_price written out as a plain loop over the payments"""
+    price = 0.0
+    for Ti in T[1:]:
+        price += (c / freq) * (1 + r[t, Ti] / freq) ** (-freq * (Ti - t))
+    price += principal * (1 + r[t, T[-1]] / freq) ** (-freq * (T[-1] - t))
+    return price
+
+
+@pytest.fixture
+def r():
+    return np.random.default_rng(0).uniform(0.01, 0.06, (10, 40))
+
+
+BONDS = [np.arange(2, 12), np.array([2, 5, 9, 30]), np.array([1, 3])]
+COUPONS = [5.0, 3.0, 0.0]
+
+BAD_BONDS = {
+    "matured": np.array([1, 2]),
+    "empty": np.array([], dtype=np.int64),
+    "one date": np.array([5]),
+    "past the curve": np.array([2, 4, 100]),
+    "negative": np.array([2, -1, 10]),
+    "float": np.array([1.5, 3.7]),
+}
+
+
+@pytest.fixture(
+    params=[
+        "numpy",
+        pytest.param(
+            "numba",
+            marks=pytest.mark.skipif(
+                not hasattr(tn, "_coupon_bond_price_jit"),
+                reason="numba kernel not in use",
+            ),
+        ),
+        pytest.param(
+            "extension",
+            marks=pytest.mark.skipif(
+                not tn.HAVE_EXTENSION, reason="Cython extension not built"
+            ),
+        ),
+    ]
+)
+def single(request, monkeypatch):
+    """Make coupon_bond_price use one particular implementation"""
+    kernel = {
+        "numpy": None,
+        "numba": getattr(tn, "_coupon_bond_price_jit", None),
+        "extension": getattr(tn, "_coupon_bond_price_ext", None),
+    }[request.param]
+    monkeypatch.setattr(tn, "_coupon_bond_price_compiled", kernel)
+    return request.param
+
+
+@pytest.fixture(
+    params=[
+        "numpy",
+        pytest.param(
+            "numba",
+            marks=pytest.mark.skipif(
+                not tn.HAVE_NUMBA, reason="numba not installed"
+            ),
+        ),
+    ]
+)
+def batch(request, monkeypatch):
+    """Make coupon_bond_prices use one particular implementation"""
+    monkeypatch.setattr(tn, "HAVE_NUMBA", request.param == "numba")
+    return request.param
+
+
+@pytest.mark.parametrize("T, c", list(zip(BONDS, COUPONS)))
+def test_coupon_bond_price_matches_reference(r, single, T, c):
+    expected = reference_price(r, 1, T, c)
+    assert tn.coupon_bond_price(r, 1, T, c) == pytest.approx(expected)
+
+
+def test_coupon_bond_price_flat_curve(single):
+    r = np.full((10, 40), 0.05)
+    T = np.arange(2, 12)
+    expected = reference_price(r, 2, T, 4.0)
+    assert tn.coupon_bond_price(r, 2, T, 4.0) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("T", list(BAD_BONDS.values()), ids=list(BAD_BONDS))
+def test_coupon_bond_price_rejects_bad_maturities(r, single, T):
+    with pytest.raises(ValueError):
+        tn.coupon_bond_price(r, 2, T, 5)
+
+
+@pytest.mark.parametrize("t", [-1, 20])
+def test_coupon_bond_price_rejects_bad_date(r, single, t):
+    # The maturities are on the curve and end after t, only t is off it
+    with pytest.raises(ValueError, match="t is outside"):
+        tn.coupon_bond_price(r, t, np.array([2, 4, 30]), 5)
+
+
+def test_coupon_bond_prices_matches_reference(r, batch):
+    expected = [reference_price(r, 1, T, c) for T, c in zip(BONDS, COUPONS)]
+    prices = tn.coupon_bond_prices(r, 1, BONDS, COUPONS)
+    np.testing.assert_allclose(prices, expected)
+
+
+@pytest.mark.parametrize("T", list(BAD_BONDS.values()), ids=list(BAD_BONDS))
+def test_coupon_bond_prices_rejects_bad_maturities(r, batch, T):
+    with pytest.raises(ValueError):
+        tn.coupon_bond_prices(r, 2, [np.arange(2, 12), T], [5, 5])
+
+
+@pytest.mark.parametrize("T", [BAD_BONDS["empty"], BAD_BONDS["one date"]])
+def test_coupon_bond_prices_explains_bonds_without_payments(r, batch, T):
+    # np.add.reduceat would fail with an opaque IndexError on these
+    with pytest.raises(ValueError, match="payment dates"):
+        tn.coupon_bond_prices(r, 2, [T, np.arange(2, 12)], [5, 5])
+
+
+def test_coupon_bond_prices_empty_batch(r, batch):
+    prices = tn.coupon_bond_prices(r, 1, [], [])
+    assert prices.shape == (0,)
+
+
+def test_coupon_bond_prices_rejects_missing_coupons(r, batch):
+    with pytest.raises(ValueError):
+        tn.coupon_bond_prices(r, 1, BONDS, COUPONS[:-1])
+
+
+@pytest.mark.skipif(not tn.HAVE_NUMBA, reason="numba not installed")
+def test_coupon_bond_prices_restores_thread_count(r):
+    import numba
+
+    n_threads = numba.get_num_threads()
+    tn.coupon_bond_prices(r, 1, BONDS, COUPONS, n_threads=1)
+    assert numba.get_num_threads() == n_threads
+
+
+def test_coupon_bond_price_cached_matches_reference(r):
+    ts = np.array([0, 1, 2])
+    T = np.arange(2, 12)
+    ctx = tn.PricingContext.from_rates(r, ts, T)
+    for j, t in enumerate(ts):
+        expected = reference_price(r, t, T, 5.0)
+        assert tn.coupon_bond_price_cached(ctx, j, 5.0) == pytest.approx(
+            expected
+        )
+
+
+def test_discount_factor_fast_is_close(r):
+    T = np.arange(2, 12)
+    expected = np.exp(-r[1, T] * (T - 1))
+    np.testing.assert_allclose(tn.discount_factor(r, 1, T), expected)
+    fast = tn.discount_factor(r, 1, T, fast=True)
+    np.testing.assert_allclose(fast, expected, rtol=2e-4)
+
+
+def test_discount_factor_fast_shapes(r):
+    T = np.arange(2, 12)
+    expected = np.exp(-r[1, T] * (T - 1))
+
+    out = np.empty(T.shape)
+    assert tn.discount_factor(r, 1, T, fast=True, out=out) is out
+    np.testing.assert_allclose(out, expected, rtol=2e-4)
+
+    # A strided out cannot take the kernel and gets the exact result
+    strided = np.empty(2 * T.size)[::2]
+    tn.discount_factor(r, 1, T, fast=True, out=strided)
+    np.testing.assert_allclose(strided, expected)
+
+    scalar = tn.discount_factor(r, 1, 3, fast=True)
+    assert np.ndim(scalar) == 0 and not isinstance(scalar, np.ndarray)
+    assert scalar == pytest.approx(expected[1], rel=2e-4)
+
+
+def test_prepare_rates_layout(r):
+    prepared = tn.prepare_rates(np.asfortranarray(r))
+    assert prepared.flags.c_contiguous
+    assert prepared.dtype == np.float64
+
+    T = np.arange(2, 12)
+    np.testing.assert_allclose(
+        tn.discount_factor(prepared, 1, T), tn.discount_factor(r, 1, T)
+    )
+
+
+def test_discount_factor_writes_into_out(r):
+    T = np.arange(2, 12)
+    out = np.empty(T.shape)
+    assert tn.discount_factor(r, 1, T, out=out) is out
+    np.testing.assert_allclose(out, np.exp(-r[1, T] * (T - 1)))
+    assert tn.discount_factor(r, 1, 3) == pytest.approx(out[1])
+
+
+def test_discount_factor_rejects_maturities_off_the_curve(r):
+    with pytest.raises(IndexError):
+        tn.discount_factor(r, 1, np.array([2, 40]))
+
+
+def test_compound_and_discount_accept_arrays():
+    rates = np.array([0.01, 0.05])
+    np.testing.assert_allclose(
+        tn.compound(rates, 2, 10, False), (1 + rates / 2) ** 20
+    )
+    np.testing.assert_allclose(
+        tn.discount(rates, 2, 10, False), (1 + rates / 2) ** -20
+    )
+    np.testing.assert_allclose(tn.compound(rates, 2, 10), np.exp(rates * 10))
+    np.testing.assert_allclose(tn.discount(rates, 2, 10), np.exp(-rates * 10))
+
+
+@pytest.mark.parametrize("n_infinity", [True, False])
+def test_compound_and_discount_scalar_matches_array(n_infinity):
+    rates = np.array([0.05, 0.05])
+    for f in (tn.compound, tn.discount):
+        scalar = f(0.05, 2, 10, n_infinity)
+        assert isinstance(scalar, float)
+        np.testing.assert_allclose(f(rates, 2, 10, n_infinity), scalar)
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_compound_and_discount_scalar_overflow_and_domain():
+    # math raises on these, the scalar path returns what NumPy would
+    assert tn.compound(1.0, 1, 1000) == np.inf
+    assert tn.compound(1.0, 1, 2000, False) == np.inf
+    assert np.isnan(tn.discount(-3.0, 2, 1, False))
+    assert np.isnan(tn.compound(-3.0, 2, 1, False))
+
+
+@pytest.mark.skipif(not tn.HAVE_NUMEXPR, reason="numexpr not installed")
+def test_numexpr_path_matches_numpy(monkeypatch):
+    rates = np.linspace(0.01, 0.05, 50)
+    expected = [f(rates, 2, 10, False) for f in (tn.compound, tn.discount)]
+
+    monkeypatch.setattr(tn, "_use_numexpr", lambda r, T: True)
+    for f, value in zip((tn.compound, tn.discount), expected):
+        np.testing.assert_allclose(f(rates, 2, 10, False), value)
+
+
+@pytest.mark.skipif(not tn.HAVE_NUMEXPR, reason="numexpr not installed")
+def test_numexpr_needs_threads_and_a_large_array():
+    import numexpr
+
+    big = np.empty(tn._NUMEXPR_MIN_SIZE + 1)
+    previous = numexpr.set_num_threads(1)
+    try:
+        assert not tn._use_numexpr(big, 10)
+        numexpr.set_num_threads(2)
+        assert tn._use_numexpr(big, 10)
+        assert not tn._use_numexpr(big[:10], 10)
+    finally:
+        numexpr.set_num_threads(previous)
+
+
+def test_integer_inputs_give_float_results():
+    ret = tn.compound(np.array([1, 2]), 1, np.array([3, 3]), False)
+    assert ret.dtype == np.float64
+    np.testing.assert_allclose(ret, [8.0, 27.0])
+
+    r = np.ones((2, 4), dtype=int)
+    np.testing.assert_allclose(
+        tn.discount_factor(r, 1, np.array([2, 3])), np.exp([-1.0, -2.0])
+    )
+
+
+def test_rate_from_discount_inverts_discount():
+    rates = np.array([1e-6, 0.05])
+    Z_T = tn.discount(rates, 2, 10, n_infinity=False)
+    np.testing.assert_allclose(
+        tn.rate_from_discount(2, Z_T, 10, n_infinity=False), rates
+    )
@@ -0,0 +1,19 @@
+import numpy as np
+import pytest
+
+from prything import temp
+from prything import teaching_notes_1 as tn
+
+
+def test_temp_prices_like_teaching_notes():
+    r = np.random.default_rng(0).uniform(0.01, 0.06, (10, 40))
+    T = np.array([2, 5, 9, 30])
+
+    # The first date carries no payment and the coupon is split by freq
+    expected = sum(
+        2.5 * (1 + r[1, Ti] / 2) ** (-2 * (Ti - 1)) for Ti in T[1:]
+    ) + 100 * (1 + r[1, 30] / 2) ** (-2 * 29)
+    assert temp.coupon_bond_price(r, 1, T, 5.0) == pytest.approx(expected)
+    assert temp.coupon_bond_price(r, 1, T, 5.0) == tn.coupon_bond_price(
+        r, 1, T, 5.0
+    )